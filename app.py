@@ -5,8 +5,39 @@ import sys
 sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
 
 
+import asyncio
+import threading
 import streamlit as st
-from utils.tupper_assistant import get_answer_to_question
+from utils.tupper_assistant import astream_answer_to_question
+
+
+# -------------------------------------------------------------
+# Background event loop shared by all sessions
+# The assistant is async; running it on one long-lived loop (instead of
+# asyncio.run per question) keeps the pooled HTTP connections reusable
+# -------------------------------------------------------------
+@st.cache_resource(show_spinner=False)
+def get_event_loop():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+
+def iter_async(agen):
+    """
+    Consumes an async generator on the background loop as a regular iterator,
+    so it can be passed to st.write_stream.
+    """
+    loop = get_event_loop()
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        # Release the generator if the script stops mid-stream (e.g. a new question)
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop)
 
 
 # -------------------------------------------------------------
@@ -41,17 +72,14 @@ user_question = st.text_input("Tu pregunta", placeholder="Ej: Quiero platos bajo
 
 # -------------------------------------------------------------
 # Call the assistant only when the user enters a question
-# Wraps the call with a spinner and error handling
+# Streams the reply as it is generated, with a spinner and error handling
 # -------------------------------------------------------------
 if user_question:
     with st.spinner("Pensando..."):
         try:
-            # Core logic: fetch the assistant's response based on the question
-            response = get_answer_to_question(user_question)
-
-            # Display success and show the assistant’s reply
+            # Display success and stream the assistant’s reply token by token
             st.success("Esto es lo que encontré:")
-            st.markdown(response)
+            st.write_stream(iter_async(astream_answer_to_question(user_question)))
         except Exception as e:
             # Handle any unexpected error gracefully
             st.error(f"Ocurrió un error: {e}")
@@ -0,0 +1,65 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import diet_rules
+from utils.diet_rules import apply_heuristics, apply_heuristics_df
+
+CATALOG = Path(__file__).resolve().parent.parent / "data" / "df_final_official.csv"
+FLAG_COLUMNS = list(apply_heuristics({"ingredientes": "", "nombre_plato": ""}))
+
+"""
+Extra rows that exercise the keyword matching beyond what the catalog contains:
+uppercase and accented text, keywords only in the name, a keyword that would only appear
+if ingredients and name were joined without a separator ("pa" + "sta"), and missing text.
+"""
+EDGE_ROWS = [
+    {"nombre_plato": "SOPA DE JAMÓN", "ingredientes": "Agua, JAMÓN, Sal"},
+    {"nombre_plato": "Bizcocho casero", "ingredientes": "Harina de ESPELTA, Huevo"},
+    {"nombre_plato": "Ensalada con queso", "ingredientes": "Lechuga, tomate"},
+    {"nombre_plato": "sta", "ingredientes": "Aceite, sal, pa"},
+    {"nombre_plato": "Crema de calabaza", "ingredientes": ""},
+    {"nombre_plato": "", "ingredientes": "Atún, mayonesa, galleta"},
+    {"nombre_plato": None, "ingredientes": None},
+]
+
+
+def large_catalog(min_rows: int) -> pd.DataFrame:
+    df = pd.read_csv(CATALOG)
+    edge = pd.DataFrame(EDGE_ROWS).assign(kcal=150.0, hidratos=3.0, proteinas=14.0)
+    df = pd.concat([df, edge], ignore_index=True)
+    return pd.concat([df] * (min_rows // len(df) + 1), ignore_index=True)
+
+
+@pytest.mark.skipif(diet_rules.hyperscan is None, reason="hyperscan is not installed")
+def test_multiscan_matches_str_contains_path(monkeypatch):
+    df = large_catalog(diet_rules._MULTISCAN_MIN_ROWS)
+    assert len(df) >= diet_rules._MULTISCAN_MIN_ROWS
+
+    original = diet_rules._multiscan_matches
+    calls = []
+
+    def spy(*args):
+        calls.append(args)
+        return original(*args)
+
+    monkeypatch.setattr(diet_rules, "_multiscan_matches", spy)
+    hyperscan_flags = apply_heuristics_df(df)[FLAG_COLUMNS]
+    assert calls, "the Hyperscan path was not taken"
+
+    monkeypatch.setattr(diet_rules, "_MULTISCAN_DB", None)
+    regex_flags = apply_heuristics_df(df)[FLAG_COLUMNS]
+
+    pd.testing.assert_frame_equal(hyperscan_flags, regex_flags)
+
+
+def test_vectorized_flags_match_row_wise_rules():
+    df = large_catalog(0)
+    vectorized = apply_heuristics_df(df)[FLAG_COLUMNS]
+
+    rows = df.fillna({"nombre_plato": "", "ingredientes": ""}).to_dict(orient="records")
+    row_wise = pd.DataFrame([apply_heuristics(r) for r in rows])[FLAG_COLUMNS]
+
+    np.testing.assert_array_equal(vectorized.to_numpy(), row_wise.to_numpy())
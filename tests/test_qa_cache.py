@@ -0,0 +1,128 @@
+import sqlite3
+import numpy as np
+import pytest
+
+from utils.qa_cache import QACache, normalize_question
+
+"""
+The semantic tier must never return the answer of a question with different filters,
+even when the embedding model scores the two questions as near-identical. The fake
+embedder below maps every question of a near-miss pair to the same vector (the worst
+case for a similarity threshold), so only the filter check can tell them apart.
+"""
+
+NEAR_MISS_PAIRS = [
+    ("Platos de menos de 400 kcal", {"kcal": "<400"},
+     "Platos de menos de 500 kcal", {"kcal": "<500"}),
+    ("Quiero platos con lactosa", {},
+     "Quiero platos sin lactosa", {"sin_lactosa": True}),
+    ("Comidas con gluten para la semana", {},
+     "Comidas sin gluten para la semana", {"sin_gluten": True}),
+    ("Platos veganos de más de 300 kcal", {"is_vegano": True, "kcal": ">300"},
+     "Platos veganos de menos de 300 kcal", {"is_vegano": True, "kcal": "<300"}),
+]
+
+
+def constant_embed(question: str) -> list:
+    return [1.0, 0.0, 0.0, 0.0]
+
+
+def make_cache(tmp_path, embed=constant_embed, threshold=0.97):
+    return QACache(tmp_path / "qa_cache.sqlite", "catalog", 3600, threshold, embed)
+
+
+@pytest.mark.parametrize("question, filters, other_question, other_filters", NEAR_MISS_PAIRS)
+def test_near_miss_questions_do_not_share_answers(tmp_path, question, filters,
+                                                  other_question, other_filters):
+    cache = make_cache(tmp_path)
+    cache.put(question, filters, "answer")
+
+    assert cache.get_exact(other_question) is None
+    answer, query_vec = cache.get_similar(other_question, other_filters)
+    assert answer is None
+    assert query_vec is not None
+
+
+@pytest.mark.parametrize("question, filters, other_question, other_filters", NEAR_MISS_PAIRS)
+def test_similar_question_with_same_filters_is_a_hit(tmp_path, question, filters,
+                                                    other_question, other_filters):
+    cache = make_cache(tmp_path)
+    cache.put(question, filters, "answer")
+
+    answer, _ = cache.get_similar(other_question, dict(reversed(list(filters.items()))))
+    assert answer == "answer"
+
+
+def test_exact_hit_ignores_case_and_whitespace(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("Platos  sin gluten", {"sin_gluten": True}, "answer")
+
+    assert cache.get_exact("  platos sin GLUTEN ") == "answer"
+
+
+def test_dissimilar_question_is_a_miss(tmp_path):
+    vectors = {
+        normalize_question("Platos sin gluten"): [1.0, 0.0, 0.0, 0.0],
+        normalize_question("Postres sin gluten"): [0.0, 1.0, 0.0, 0.0],
+    }
+    cache = make_cache(tmp_path, embed=vectors.__getitem__)
+    cache.put("Platos sin gluten", {"sin_gluten": True}, "answer")
+
+    answer, _ = cache.get_similar("Postres sin gluten", {"sin_gluten": True})
+    assert answer is None
+
+
+def test_entries_and_filters_survive_reload(tmp_path):
+    make_cache(tmp_path).put("Platos de menos de 400 kcal", {"kcal": "<400"}, "answer")
+
+    cache = make_cache(tmp_path)
+    assert cache.get_exact("Platos de menos de 400 kcal") == "answer"
+    assert cache.get_similar("Platos de menos de 500 kcal", {"kcal": "<500"})[0] is None
+    assert cache.get_similar("Platos por debajo de 400 kcal", {"kcal": "<400"})[0] == "answer"
+
+
+def test_other_catalog_entries_are_dropped(tmp_path):
+    make_cache(tmp_path).put("Platos sin gluten", {"sin_gluten": True}, "answer")
+
+    cache = QACache(tmp_path / "qa_cache.sqlite", "new-catalog", 3600, 0.97, constant_embed)
+    assert cache.get_exact("Platos sin gluten") is None
+    assert cache.get_similar("Platos sin gluten", {"sin_gluten": True})[0] is None
+
+
+def test_int8_similarity_matches_float(tmp_path):
+    rng = np.random.default_rng(0)
+    base = rng.normal(size=384)
+    near = base + rng.normal(scale=0.05, size=384)
+    vectors = {normalize_question("a"): base, normalize_question("b"): near}
+    exact_sim = float(base @ near / (np.linalg.norm(base) * np.linalg.norm(near)))
+
+    cache = make_cache(tmp_path, embed=vectors.__getitem__, threshold=exact_sim - 0.01)
+    cache.put("a", {}, "answer")
+    assert cache.get_similar("b", {})[0] == "answer"
+
+    cache = make_cache(tmp_path, embed=vectors.__getitem__, threshold=exact_sim + 0.01)
+    assert cache.get_similar("b", {})[0] is None
+
+
+def test_old_table_layout_is_replaced(tmp_path):
+    path = tmp_path / "qa_cache.sqlite"
+    conn = sqlite3.connect(str(path))
+    conn.execute(
+        "CREATE TABLE qa_cache ("
+        "key TEXT PRIMARY KEY, catalog TEXT, embedding BLOB, answer TEXT, created REAL)"
+    )
+    conn.execute("INSERT INTO qa_cache VALUES ('k', 'catalog', x'00', 'old', 0)")
+    conn.commit()
+    conn.close()
+
+    cache = make_cache(tmp_path)
+    cache.put("Platos sin gluten", {"sin_gluten": True}, "answer")
+    assert make_cache(tmp_path).get_exact("Platos sin gluten") == "answer"
+
+
+def test_corrupt_file_is_replaced(tmp_path):
+    (tmp_path / "qa_cache.sqlite").write_bytes(b"not a sqlite database" * 100)
+
+    cache = make_cache(tmp_path)
+    cache.put("Platos sin gluten", {"sin_gluten": True}, "answer")
+    assert make_cache(tmp_path).get_exact("Platos sin gluten") == "answer"
@@ -1,8 +1,10 @@
 # utils/diet_agent.py
 
-import os
+import asyncio
+import random
+from openai import RateLimitError
 from pydantic import BaseModel
-from utils.openai_router_wrapper import ChatOpenRouter
+from utils.openai_router_wrapper import get_chat, get_env_var
 from utils.diet_rules import apply_heuristics
 from langchain_core.prompts import ChatPromptTemplate
 
@@ -78,7 +80,7 @@ prompt = ChatPromptTemplate.from_messages([
 
 # Initialize the LLM instance with deterministic output (temperature = 0)
 # Uses a wrapper to select model routing and configuration
-llm = ChatOpenRouter(model=os.getenv("LLM_MODEL"), temperature=0)
+llm = get_chat(0)
 
 # Define structured output parsing for the LLM's response
 # Validates that the output conforms to the DietClassification schema
@@ -109,8 +111,15 @@ def classify_dish(row: dict) -> DietClassification:
     Returns:
         DietClassification: A structured object containing all inferred tags.
     """
+    return chain.invoke(build_payload(row))
+
+
+def build_payload(row: dict) -> dict:
+    """
+    Builds the prompt variables for a dish, including the heuristic flags as prior context.
+    """
     heur = apply_heuristics(row)
-    payload = {
+    return {
         "nombre_plato": row["nombre_plato"],
         "ingredientes": row["ingredientes"],
         "precio": row["precio"],
@@ -120,4 +129,81 @@ def classify_dish(row: dict) -> DietClassification:
         "grasas": row["grasas"],
         "existing_flags": heur
     }
-    return chain.invoke(payload)
+
+
+# -----------------------------------------------------------------------------
+# ASYNC BULK CLASSIFICATION
+# -----------------------------------------------------------------------------
+
+"""
+Classifying the full catalog one dish at a time is dominated by network round-trips.
+The async variants below run several requests concurrently, bounded by a semaphore,
+while a simple rate limiter keeps the request rate under the provider's limit
+(`OPENROUTER_RPM`, requests per minute; unset or 0 disables it). Rate-limit errors (429)
+are retried with exponential backoff.
+"""
+
+class RateLimiter:
+    """
+    Spaces out request starts so that at most `rpm` requests begin per minute.
+    """
+    def __init__(self, rpm: float):
+        self.interval = 60.0 / rpm if rpm else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+async def ainvoke_with_backoff(chain, payload: dict, max_retries: int = 5,
+                              limiter: RateLimiter = None):
+    """
+    Awaits `chain.ainvoke(payload)`, retrying with exponential backoff (plus jitter)
+    when the provider answers with a 429.
+    """
+    for attempt in range(max_retries + 1):
+        if limiter:
+            await limiter.acquire()
+        try:
+            return await chain.ainvoke(payload)
+        except RateLimitError:
+            if attempt == max_retries:
+                raise
+            await asyncio.sleep(2 ** attempt + random.random())
+
+
+async def aclassify_dish(row: dict, max_retries: int = 5,
+                         limiter: RateLimiter = None) -> DietClassification:
+    """
+    Async version of `classify_dish`, retried with backoff on rate-limit errors.
+    """
+    return await ainvoke_with_backoff(chain, build_payload(row), max_retries, limiter)
+
+
+async def classify_many(rows: list, concurrency: int = 8) -> list:
+    """
+    Classifies many dishes concurrently, returning results in the same order as `rows`.
+
+    Parameters:
+        rows (list): Dish dictionaries, as expected by `classify_dish`.
+        concurrency (int): Maximum number of in-flight LLM requests.
+
+    Returns:
+        list[DietClassification]: One classification per input row.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(float(get_env_var("OPENROUTER_RPM") or 0))
+
+    async def _guarded(row):
+        async with semaphore:
+            return await aclassify_dish(row, limiter=limiter)
+
+    return await asyncio.gather(*[_guarded(r) for r in rows])
@@ -6,13 +6,134 @@ to each dish based on its name, ingredients, and macronutrient profile.
 These labels are later used to enrich the vector store metadata for retrieval.
 """
 
+import re
+import numpy as np
+import pandas as pd
+
+# Optional: Hyperscan multi-pattern matcher for large catalogs (see apply_heuristics_df)
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+# -----------------------------------------------------------------------------
+# KEYWORD SETS AND PRECOMPILED PATTERNS
+# -----------------------------------------------------------------------------
+
+"""
+Each rule is backed by a keyword set compiled once into a single regex alternation.
+A compiled pattern scans the text in one C-level pass instead of one Python-level
+substring check per keyword, which matters when tagging the whole catalog.
+"""
+_VEG_FORBIDDEN = {"pollo", "carne", "cerdo", "jamón", "pescado", "marisco", "gamba", "atún"}
+_VEGAN_FORBIDDEN = _VEG_FORBIDDEN | {
+    "leche", "queso", "mantequilla", "huevo", "nata", "miel", "yogur"
+}
+_POSTRE_KEYWORDS = {"azúcar", "chocolate", "vainilla", "canela", "nata", "galleta", "dulce", "bizcocho"}
+_CUCHARA_KEYWORDS = {"sopa", "crema", "guiso", "estofado", "potaje"}
+_LACTEOS = {"leche", "nata", "queso", "mantequilla", "yogur"}
+_LOWFREEZE = {"patata", "pasta", "leche", "nata", "yogur", "mayonesa", "huevo", "queso"}
+_GLUTEN = {"trigo", "cebada", "centeno", "espelta", "kamut", "galleta", "harina"}
+
+
+def _compile_keywords(words: set) -> re.Pattern:
+    """
+    Builds a single alternation pattern matching any of the given (lowercase) keywords.
+    """
+    return re.compile("|".join(map(re.escape, sorted(words))))
+
+
+_VEG_RE = _compile_keywords(_VEG_FORBIDDEN)
+_VEGAN_RE = _compile_keywords(_VEGAN_FORBIDDEN)
+_POSTRE_RE = _compile_keywords(_POSTRE_KEYWORDS)
+_CUCHARA_RE = _compile_keywords(_CUCHARA_KEYWORDS)
+_LACTEOS_RE = _compile_keywords(_LACTEOS)
+_LOWFREEZE_RE = _compile_keywords(_LOWFREEZE)
+_GLUTEN_RE = _compile_keywords(_GLUTEN)
+
+
+"""
+With Hyperscan installed, all keyword patterns are compiled into one multi-pattern
+database, so a single linear scan of a text reports every rule that matched, instead of
+one regex pass per rule. It is only worth it for large catalogs, hence the row threshold.
+Texts are lowercased before scanning, so no case-insensitive flag is needed.
+"""
+_MULTISCAN_MIN_ROWS = 1000
+_RULE_IDS = {
+    "vegetariano": 0, "vegano": 1, "postre": 2, "cuchara": 3,
+    "lacteos": 4, "lowfreeze": 5, "gluten": 6
+}
+
+
+def _build_multiscan_db():
+    if hyperscan is None:
+        return None
+    patterns = [_VEG_RE, _VEGAN_RE, _POSTRE_RE, _CUCHARA_RE, _LACTEOS_RE, _LOWFREEZE_RE, _GLUTEN_RE]
+    db = hyperscan.Database()
+    db.compile(
+        expressions=[p.pattern.encode("utf-8") for p in patterns],
+        ids=list(range(len(patterns))),
+        elements=len(patterns),
+        flags=[hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_UTF8] * len(patterns)
+    )
+    return db
+
+
+_MULTISCAN_DB = _build_multiscan_db()
+
+
+def _multiscan(text_l: str) -> set:
+    """
+    Returns the ids (see `_RULE_IDS`) of every keyword rule matching the lowercased text.
+    """
+    hits = set()
+    _MULTISCAN_DB.scan(
+        text_l.encode("utf-8"),
+        match_event_handler=lambda rule_id, start, end, flags, ctx: hits.add(rule_id)
+    )
+    return hits
+
+# -----------------------------------------------------------------------------
+# INTERNAL HELPERS (EXPECT ALREADY-LOWERCASED TEXT)
+# -----------------------------------------------------------------------------
+
+def _vegetariano_l(ing_l: str) -> bool:
+    return _VEG_RE.search(ing_l) is None
+
+
+def _vegano_l(ing_l: str) -> bool:
+    return _VEGAN_RE.search(ing_l) is None
+
+
+def _postre_l(nom_l: str, ing_l: str) -> bool:
+    return _POSTRE_RE.search(ing_l) is not None or _POSTRE_RE.search(nom_l) is not None
+
+
+def _cuchara_l(nom_l: str) -> bool:
+    return _CUCHARA_RE.search(nom_l) is not None
+
+
+def _sin_lactosa_l(ing_l: str) -> bool:
+    return _LACTEOS_RE.search(ing_l) is None
+
+
+def _no_congelar_l(ing_l: str, nom_l: str) -> bool:
+    return _LOWFREEZE_RE.search(ing_l + " " + nom_l) is not None
+
+
+def _sin_gluten_l(ing_l: str) -> bool:
+    return _GLUTEN_RE.search(ing_l) is None
+
+# -----------------------------------------------------------------------------
+# PUBLIC RULES
+# -----------------------------------------------------------------------------
+
 def is_vegetariano(ingredientes: str) -> bool:
     """
     Returns True if the dish does not contain meat or seafood,
     assuming it's suitable for a vegetarian diet.
     """
-    forbidden = {"pollo", "carne", "cerdo", "jamón", "pescado", "marisco", "gamba", "atún"}
-    return not any(w in ingredientes.lower() for w in forbidden)
+    return _vegetariano_l(ingredientes.lower())
 
 
 def is_vegano(ingredientes: str) -> bool:
@@ -20,11 +141,7 @@ def is_vegano(ingredientes: str) -> bool:
     Returns True if the dish contains no animal-derived ingredients,
     suitable for a vegan diet.
     """
-    forbidden = {
-        "pollo", "carne", "cerdo", "jamón", "pescado", "marisco", "gamba", "atún",
-        "leche", "queso", "mantequilla", "huevo", "nata", "miel", "yogur"
-    }
-    return not any(w in ingredientes.lower() for w in forbidden)
+    return _vegano_l(ingredientes.lower())
 
 
 def is_keto(kcal: float, hidratos: float) -> bool:
@@ -47,8 +164,7 @@ def es_postre(nombre: str, ingredientes: str) -> bool:
     Attempts to classify a dish as dessert based on common sweet-related keywords
     in the dish name or ingredient list.
     """
-    keywords = {"azúcar", "chocolate", "vainilla", "canela", "nata", "galleta", "dulce", "bizcocho"}
-    return any(w in ingredientes.lower() or w in nombre.lower() for w in keywords)
+    return _postre_l(nombre.lower(), ingredientes.lower())
 
 
 def de_cuchara(nombre: str, ingredientes: str) -> bool:
@@ -56,7 +172,7 @@ def de_cuchara(nombre: str, ingredientes: str) -> bool:
     Returns True if the dish is typically eaten with a spoon,
     based on the name of the dish.
     """
-    return any(w in nombre.lower() for w in {"sopa", "crema", "guiso", "estofado", "potaje"})
+    return _cuchara_l(nombre.lower())
 
 
 def alto_proteina(proteinas: float) -> bool:
@@ -70,8 +186,7 @@ def sin_lactosa(ingredientes: str) -> bool:
     """
     Returns True if no common dairy ingredients are found.
     """
-    lacteos = {"leche", "nata", "queso", "mantequilla", "yogur"}
-    return not any(w in ingredientes.lower() for w in lacteos)
+    return _sin_lactosa_l(ingredientes.lower())
 
 
 def no_congelar(ingredientes: str, nombre: str) -> bool:
@@ -79,9 +194,7 @@ def no_congelar(ingredientes: str, nombre: str) -> bool:
     Flags dishes that should not be frozen due to ingredients
     known to degrade in texture or safety after freezing.
     """
-    lowfreeze = {"patata", "pasta", "leche", "nata", "yogur", "mayonesa", "huevo", "queso"}
-    text = (ingredientes + " " + nombre).lower()
-    return any(w in text for w in lowfreeze)
+    return _no_congelar_l(ingredientes.lower(), nombre.lower())
 
 
 def apto_congelar(ingredientes: str, nombre: str) -> bool:
@@ -97,8 +210,7 @@ def sin_gluten(ingredientes: str) -> bool:
     Returns True if no gluten-containing ingredients are detected.
     This is a best-effort heuristic, not medically reliable.
     """
-    gluten = {"trigo", "cebada", "centeno", "espelta", "kamut", "galleta", "harina"}
-    return not any(w in ingredientes.lower() for w in gluten)
+    return _sin_gluten_l(ingredientes.lower())
 
 
 def apply_heuristics(row: dict) -> dict:
@@ -106,23 +218,101 @@ def apply_heuristics(row: dict) -> dict:
     Applies all dietary rule functions to a given dish row.
     The row should contain fields: 'kcal', 'hidratos', 'proteinas', 'ingredientes', 'nombre_plato'.
 
+    Text fields are lowercased once here and shared across all keyword rules.
+
     Returns a dictionary with all inferred binary attributes.
     """
     kcal = float(row.get("kcal") or 0)
     hidr = float(row.get("hidratos") or 0)
     prot = float(row.get("proteinas") or 0)
-    ing = row.get("ingredientes", "")
-    nom = row.get("nombre_plato", "")
+    ing_l = row.get("ingredientes", "").lower()
+    nom_l = row.get("nombre_plato", "").lower()
 
     return {
-        "is_vegano": is_vegano(ing),
-        "is_vegetariano": is_vegetariano(ing),
+        "is_vegano": _vegano_l(ing_l),
+        "is_vegetariano": _vegetariano_l(ing_l),
         "is_keto": is_keto(kcal, hidr),
         "bajo_en_calorias": bajo_en_calorias(kcal),
-        "es_postre": es_postre(nom, ing),
-        "de_cuchara": de_cuchara(nom, ing),
+        "es_postre": _postre_l(nom_l, ing_l),
+        "de_cuchara": _cuchara_l(nom_l),
         "alto_proteina": alto_proteina(prot),
-        "sin_lactosa": sin_lactosa(ing),
-        "sin_gluten": sin_gluten(ing),
-        "congelar": apto_congelar(ing, nom)
+        "sin_lactosa": _sin_lactosa_l(ing_l),
+        "sin_gluten": _sin_gluten_l(ing_l),
+        "congelar": not _no_congelar_l(ing_l, nom_l)
+    }
+
+
+def apply_heuristics_df(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Vectorized counterpart of `apply_heuristics` for a whole DataFrame of dishes.
+
+    Each rule is evaluated once per column with pandas string/arithmetic operations
+    instead of calling `apply_heuristics` row by row. The input is not modified;
+    a copy is returned with one boolean (`np.bool_`) column per inferred attribute,
+    in the same order as the keys produced by `apply_heuristics`.
+    """
+    kcal = pd.to_numeric(df["kcal"], errors="coerce")
+    hidr = pd.to_numeric(df["hidratos"], errors="coerce")
+    prot = pd.to_numeric(df["proteinas"], errors="coerce")
+    ing = df["ingredientes"].fillna("").astype(str).str.lower()
+    nom = df["nombre_plato"].fillna("").astype(str).str.lower()
+
+    if _MULTISCAN_DB is not None and len(df) >= _MULTISCAN_MIN_ROWS:
+        matches = _multiscan_matches(ing, nom)
+    else:
+        matches = {
+            "vegetariano": ing.str.contains(_VEG_RE),
+            "vegano": ing.str.contains(_VEGAN_RE),
+            "postre": ing.str.contains(_POSTRE_RE) | nom.str.contains(_POSTRE_RE),
+            "cuchara": nom.str.contains(_CUCHARA_RE),
+            "lacteos": ing.str.contains(_LACTEOS_RE),
+            "lowfreeze": (ing + " " + nom).str.contains(_LOWFREEZE_RE),
+            "gluten": ing.str.contains(_GLUTEN_RE)
+        }
+
+    flags = {
+        "is_vegano": ~matches["vegano"],
+        "is_vegetariano": ~matches["vegetariano"],
+        "is_keto": (hidr < 5) & (kcal > 100),
+        "bajo_en_calorias": kcal < 80,
+        "es_postre": matches["postre"],
+        "de_cuchara": matches["cuchara"],
+        "alto_proteina": prot > 12,
+        "sin_lactosa": ~matches["lacteos"],
+        "sin_gluten": ~matches["gluten"],
+        "congelar": ~matches["lowfreeze"]
+    }
+
+    out = df.copy()
+    for col, values in flags.items():
+        out[col] = values.to_numpy(dtype=np.bool_)
+    return out
+
+
+def _multiscan_matches(ing: pd.Series, nom: pd.Series) -> dict:
+    """
+    Hyperscan path of `apply_heuristics_df`: one scan of the ingredients and one of the
+    name per dish, mapped back to one boolean Series per keyword rule.
+
+    Keywords contain no spaces, so matching ingredients and name separately is equivalent
+    to matching their concatenation (as `no_congelar` does).
+    """
+    ing_hits = [_multiscan(text) for text in ing]
+    nom_hits = [_multiscan(text) for text in nom]
+
+    def rule(name, in_ing=True, in_nom=False):
+        rule_id = _RULE_IDS[name]
+        return pd.Series(
+            [(in_ing and rule_id in i) or (in_nom and rule_id in n) for i, n in zip(ing_hits, nom_hits)],
+            index=ing.index, dtype=bool
+        )
+
+    return {
+        "vegetariano": rule("vegetariano"),
+        "vegano": rule("vegano"),
+        "postre": rule("postre", in_nom=True),
+        "cuchara": rule("cuchara", in_ing=False, in_nom=True),
+        "lacteos": rule("lacteos"),
+        "lowfreeze": rule("lowfreeze", in_nom=True),
+        "gluten": rule("gluten")
     }
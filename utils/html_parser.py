@@ -1,7 +1,40 @@
-from bs4 import BeautifulSoup
+from lxml import etree
+from lxml import html as lxhtml
 import pandas as pd
 import re
 
+
+def _class_xpath(tag, css_class):
+    """
+    XPath step matching `tag` elements whose class list contains `css_class`
+    (same semantics as BeautifulSoup's `class_=` filter).
+    """
+    return f"{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {css_class} ')]"
+
+
+"""
+Selectors are compiled once at import time and evaluated by lxml in C, instead of
+walking the tree in Python for every `.find()` call. Each field selector returns the
+first matching span inside a report block (empty list if missing).
+"""
+_REPORT_BLOCKS = etree.XPath("//" + _class_xpath("td", "report"))
+_PRICE_BLOCKS = etree.XPath("//" + _class_xpath("td", "price"))
+_FIELD_XPATHS = {
+    field: etree.XPath(f"(.//{_class_xpath('span', css_class)})[1]")
+    for field, css_class in {
+        "nombre_plato": "tupper",
+        "ingredientes": "ingredientes",
+        "kcal": "energia",
+        "proteinas": "proteinas",
+        "hidratos": "hidratos",
+        "grasas": "grasas",
+        "peso": "peso",
+        "alergenos": "alergenos",
+    }.items()
+}
+_NUMBER_RE = re.compile(r"[-+]?\d*\.\d+|\d+")
+
+
 def extract_dishes_from_html(html_path):
     """
     Parses the raw HTML file from Nocinomas and returns a DataFrame with nutritional and descriptive information.
@@ -18,9 +51,8 @@ def extract_dishes_from_html(html_path):
         - 'alergenos': Allergens present in the dish (string)
     """
 
-    # Load the HTML content and parse with BeautifulSoup
-    with open(html_path, encoding="utf-8") as f:
-        soup = BeautifulSoup(f, "html.parser")
+    # Load the HTML content and parse with lxml
+    tree = lxhtml.parse(str(html_path), parser=lxhtml.HTMLParser(encoding="utf-8"))
 
     result = []
 
@@ -29,62 +61,66 @@ def extract_dishes_from_html(html_path):
     into two parallel blocks: one for nutritional and textual info (`td.report`),
     and another for prices (`td.price`). These are aligned by index.
     """
-    report_blocks = soup.find_all("td", class_="report")
-    price_blocks = soup.find_all("td", class_="price")
+    report_blocks = _REPORT_BLOCKS(tree)
+    price_blocks = _PRICE_BLOCKS(tree)
 
     # Iterate over each dish block and extract relevant fields
     for i, report in enumerate(report_blocks):
-        nombre_tag = report.find("span", class_="tupper")
-        ingredientes_tag = report.find("span", class_="ingredientes")
-        kcal_tag = report.find("span", class_="energia")
-        proteinas_tag = report.find("span", class_="proteinas")
-        hidratos_tag = report.find("span", class_="hidratos")
-        grasas_tag = report.find("span", class_="grasas")
-        peso_tag = report.find("span", class_="peso")
-        alergenos_tag = report.find("span", class_="alergenos")
+        texts = {field: get_text(xpath(report)) for field, xpath in _FIELD_XPATHS.items()}
 
         # Match the price by index (if it exists)
-        precio_tag = price_blocks[i] if i < len(price_blocks) else None
+        precio_text = get_text([price_blocks[i]]) if i < len(price_blocks) else None
 
         # Only process valid entries (must have name and ingredients)
-        if nombre_tag and ingredientes_tag:
+        if texts["nombre_plato"] is not None and texts["ingredientes"] is not None:
             result.append({
-                "nombre_plato": clean_nombre(nombre_tag),
-                "ingredientes": ingredientes_tag.get_text(strip=True),
-                "precio": clean_float(precio_tag),
-                "kcal": clean_float(kcal_tag),
-                "proteinas": clean_float(proteinas_tag),
-                "hidratos": clean_float(hidratos_tag),
-                "grasas": clean_float(grasas_tag),
-                "peso": clean_float(peso_tag),
-                "alergenos": alergenos_tag.get_text(strip=True) if alergenos_tag else None
+                "nombre_plato": clean_nombre(texts["nombre_plato"]),
+                "ingredientes": texts["ingredientes"],
+                "precio": clean_float(precio_text),
+                "kcal": clean_float(texts["kcal"]),
+                "proteinas": clean_float(texts["proteinas"]),
+                "hidratos": clean_float(texts["hidratos"]),
+                "grasas": clean_float(texts["grasas"]),
+                "peso": clean_float(texts["peso"]),
+                "alergenos": texts["alergenos"]
             })
 
-    return pd.DataFrame(result)
+    return pd.DataFrame.from_records(result)
+
+
+def get_text(elements):
+    """
+    Returns the stripped text of the first element in `elements`, or None if it is empty.
+
+    Mirrors BeautifulSoup's `get_text(strip=True)`: every text node is stripped and
+    the pieces are concatenated without separator.
+    """
+    if not elements:
+        return None
+    return "".join(t.strip() for t in elements[0].itertext())
 
 
-def clean_float(tag):
+def clean_float(text):
     """
-    Extracts the first floating-point number from the given tag's text.
+    Extracts the first floating-point number from the given text.
 
     This function is robust to European decimal formats (commas) and fallback scenarios
-    where the tag may be missing or malformed.
+    where the field may be missing or malformed.
     """
-    if tag:
+    if text is not None:
         # Normalize decimal commas to dots
-        text = tag.get_text(strip=True).replace(",", ".")
+        text = text.replace(",", ".")
         # Extract the first number found in the text (int or float)
-        match = re.search(r"[-+]?\d*\.\d+|\d+", text)
+        match = _NUMBER_RE.search(text)
         return float(match.group()) if match else None
     return None
 
 
-def clean_nombre(tag):
+def clean_nombre(text):
     """
     Cleans and returns the dish name.
 
     Dish names are sometimes formatted with a trailing colon (e.g., "Tortilla de espinacas:"),
     which we remove here.
     """
-    text = tag.get_text(strip=True)
     return text.rstrip(":")
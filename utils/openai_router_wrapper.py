@@ -1,9 +1,7 @@
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
 
-# Load local .env variables (if available)
-load_dotenv()
-
 # Try to import Streamlit and check if secrets exist
 try:
     import streamlit as st
@@ -11,6 +9,15 @@ try:
 except ImportError:
     has_streamlit_secrets = False
 
+
+@lru_cache(maxsize=None)
+def load_env():
+    """
+    Loads local .env variables (if available). Runs once, on first config access.
+    """
+    load_dotenv()
+
+
 def get_env_var(key: str):
     """
     Returns the value of an environment variable or Streamlit secret.
@@ -18,39 +25,98 @@ def get_env_var(key: str):
     1. Streamlit secrets (if running in Streamlit and key exists)
     2. os.environ (from .env or system)
     """
+    load_env()
     if has_streamlit_secrets and key in st.secrets:
-        value = st.secrets[key]
-        print(f"[INFO] Read from secrets.toml: {key} = {value}")
-        return value
-
-    value = os.getenv(key)
-    if value:
-        print(f"[INFO] Read from .env or environment: {key} = {value}")
-    return value
-
-# Retrieve config values
-api_key = get_env_var("OPENROUTER_API_KEY")
-base_url = get_env_var("OPENROUTER_BASE_URL")
-model = get_env_var("LLM_MODEL")
-
-# Fail explicitly if any required key is missing
-missing = [k for k, v in {
-    "OPENROUTER_API_KEY": api_key,
-    "OPENROUTER_BASE_URL": base_url,
-    "LLM_MODEL": model
-}.items() if not v]
-
-if missing:
-    raise RuntimeError(f"Missing config keys: {', '.join(missing)}")
+        return st.secrets[key]
+    return os.getenv(key)
+
+
+@lru_cache(maxsize=None)
+def get_config() -> dict:
+    """
+    Retrieves the OpenRouter config values once and caches them.
+    Fails explicitly if any required key is missing.
+    """
+    config = {
+        "OPENROUTER_API_KEY": get_env_var("OPENROUTER_API_KEY"),
+        "OPENROUTER_BASE_URL": get_env_var("OPENROUTER_BASE_URL"),
+        "LLM_MODEL": get_env_var("LLM_MODEL")
+    }
+    missing = [k for k, v in config.items() if not v]
+    if missing:
+        raise RuntimeError(f"Missing config keys: {', '.join(missing)}")
+    return config
 
 # LangChain wrapper
+import asyncio
+import weakref
+import httpx
 from langchain_openai.chat_models import ChatOpenAI
 
+"""
+Shared HTTP clients for every ChatOpenRouter instance. Keeping the connection pool alive
+across calls avoids a new TCP/TLS handshake with OpenRouter on each request.
+
+Async connections belong to the event loop that opened them, so the async client keeps
+one connection pool per running loop. Callers can then use several loops in turn (e.g.
+`asyncio.run` called repeatedly from a script or notebook) without reusing connections
+from a closed loop.
+"""
+http_limits = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+
+
+class PerLoopAsyncTransport(httpx.AsyncBaseTransport):
+    """
+    Async transport that lazily creates one pooled `AsyncHTTPTransport` per event loop.
+    Pools of loops that have been garbage-collected are dropped with them.
+    """
+    def __init__(self, limits: httpx.Limits):
+        self.limits = limits
+        self._transports = weakref.WeakKeyDictionary()
+
+    def _transport(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        transport = self._transports.get(loop)
+        if transport is None:
+            transport = self._transports[loop] = httpx.AsyncHTTPTransport(limits=self.limits)
+        return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport().handle_async_request(request)
+
+    async def aclose(self):
+        transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+http_client = httpx.Client(limits=http_limits)
+http_async_client = httpx.AsyncClient(transport=PerLoopAsyncTransport(http_limits))
+
 class ChatOpenRouter(ChatOpenAI):
     def __init__(self, **kwargs):
+        config = get_config()
+        kwargs.setdefault("http_client", http_client)
+        kwargs.setdefault("http_async_client", http_async_client)
+        # Default to LLM_MODEL unless a specific model is routed explicitly
+        kwargs["model"] = kwargs.get("model") or config["LLM_MODEL"]
         super().__init__(
-            model=model,
-            openai_api_key=api_key,
-            base_url=base_url,
+            openai_api_key=config["OPENROUTER_API_KEY"],
+            base_url=config["OPENROUTER_BASE_URL"],
             **kwargs
         )
+
+
+@lru_cache(maxsize=8)
+def _get_chat(temperature: float, model: str) -> ChatOpenRouter:
+    return ChatOpenRouter(model=model, temperature=temperature)
+
+
+def get_chat(temperature: float, model: str = None) -> ChatOpenRouter:
+    """
+    Returns a shared ChatOpenRouter instance per (temperature, model) pair.
+    Avoids re-running the client construction and validation for identical configurations.
+    Arguments are normalized first so that e.g. `get_chat(0)`, `get_chat(0.0)` and
+    `get_chat(0, None)` all map to the same cached instance.
+    """
+    return _get_chat(float(temperature), model or get_config()["LLM_MODEL"])
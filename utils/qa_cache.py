@@ -0,0 +1,182 @@
+# utils/qa_cache.py
+
+"""
+Answer cache for the assistant pipeline in `tupper_assistant.py`.
+
+Both LLM calls are (near) deterministic, so repeated questions can reuse a previous answer.
+The cache has two tiers:
+- Exact: sha256 of the normalized question (lowercased, collapsed whitespace). Checked
+  before any LLM call.
+- Semantic: cosine similarity between the question embedding and previously answered
+  questions, reusing the answer when it is at least the threshold. Checked after filter
+  extraction and only against entries whose parsed filters are identical: the embedding
+  model barely separates questions that differ in a number ("menos de 400 kcal" vs
+  "menos de 500 kcal") or in "con"/"sin", but their filters differ, so they never share
+  an answer. A semantic hit still skips the QA call.
+
+Entries are persisted to sqlite with their filters, expire after `ttl` seconds and are tied
+to a catalog key (vectorstore build, LLM model, prompts), so changing any of them
+invalidates them.
+
+Question embeddings are stored as int8 codes with one float scale per row (symmetric
+quantization), a quarter of the float32 size. Similarities are computed on the int8 codes
+with int32 accumulation and rescaled; the error is far below the similarity threshold margin.
+"""
+
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+from pathlib import Path
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(question.strip().lower().split())
+
+
+def filters_key(filters) -> str:
+    """
+    Canonical JSON form of the parsed filters, so equal filters compare equal as strings.
+    """
+    return json.dumps(filters, sort_keys=True, ensure_ascii=False)
+
+
+def quantize_int8(vec: np.ndarray):
+    """
+    Symmetric per-vector int8 quantization: returns (codes, scale) with vec ≈ codes * scale.
+    """
+    scale = float(np.abs(vec).max()) / 127 or 1.0
+    return np.round(vec / scale).astype(np.int8), scale
+
+
+class QACache:
+    """
+    Two-tier (exact hash + embedding similarity) answer cache backed by sqlite.
+    Thread-safe, so a single instance can be shared across Streamlit sessions.
+
+    `embed` maps a question to its embedding vector (e.g. `embedding.embed_query`).
+    """
+    def __init__(self, path: Path, catalog_key: str, ttl: float, threshold: float, embed):
+        self.ttl = ttl
+        self.threshold = threshold
+        self.catalog_key = catalog_key or ""
+        self._embed = embed
+        self._lock = threading.Lock()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = None
+        try:
+            rows = self._open(str(path))
+        except sqlite3.DatabaseError:
+            # Corrupt file or a table layout from an older version: it is only a cache,
+            # so start over with an empty file (or, failing that, an in-memory database)
+            self._conn.close()
+            path.unlink(missing_ok=True)
+            try:
+                rows = self._open(str(path))
+            except sqlite3.DatabaseError:
+                self._conn.close()
+                rows = self._open(":memory:")
+
+        # key -> (answer, created, filters); plus one embedding matrix per distinct filters
+        self._entries = {}
+        self._groups = {}
+        for key, filters, codes, scale, answer, created in rows:
+            self._add(key, filters, np.frombuffer(codes, dtype=np.int8), scale, answer, created)
+
+    def _open(self, database: str) -> list:
+        """
+        Connects to the sqlite file, drops expired or foreign-catalog entries and returns
+        the remaining rows.
+        """
+        self._conn = sqlite3.connect(database, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS qa_cache ("
+            "key TEXT PRIMARY KEY, catalog TEXT, filters TEXT, codes BLOB, scale REAL, "
+            "answer TEXT, created REAL)"
+        )
+        self._conn.execute(
+            "DELETE FROM qa_cache WHERE catalog != ? OR created < ?",
+            (self.catalog_key, time.time() - self.ttl)
+        )
+        self._conn.commit()
+        return self._conn.execute(
+            "SELECT key, filters, codes, scale, answer, created FROM qa_cache"
+        ).fetchall()
+
+    def _add(self, key, filters, codes, scale, answer, created):
+        previous = self._entries.get(key)
+        self._entries[key] = (answer, created, filters)
+        if previous is not None and previous[2] == filters:
+            return  # Already indexed in this group
+        keys, group_codes, scales = self._groups.get(filters, ([], None, None))
+        self._groups[filters] = (
+            keys + [key],
+            codes[None, :] if group_codes is None else np.vstack([group_codes, codes]),
+            np.append(scales if scales is not None else np.empty(0, np.float32), np.float32(scale))
+        )
+
+    def embed(self, question: str) -> np.ndarray:
+        vec = np.asarray(self._embed(normalize_question(question)), dtype=np.float32)
+        return vec / (np.linalg.norm(vec) or 1.0)
+
+    def _fresh(self, key: str, filters: str = None):
+        answer, created, entry_filters = self._entries.get(key, (None, 0.0, None))
+        if answer is None or time.time() - created >= self.ttl:
+            return None
+        if filters is not None and entry_filters != filters:
+            return None
+        return answer
+
+    @staticmethod
+    def _hash(question: str) -> str:
+        return hashlib.sha256(normalize_question(question).encode()).hexdigest()
+
+    def get_exact(self, question: str):
+        """
+        Returns the answer cached for this exact (normalized) question, or None.
+        """
+        with self._lock:
+            return self._fresh(self._hash(question))
+
+    def get_similar(self, question: str, filters):
+        """
+        Returns (answer, question_embedding). The answer comes from the most similar cached
+        question with identical filters, or is None on a miss; the embedding can be passed
+        to `put` to avoid computing it twice.
+        """
+        fkey = filters_key(filters)
+        query_vec = self.embed(question)
+        with self._lock:
+            group = self._groups.get(fkey)
+        if group is None:
+            return None, query_vec
+
+        keys, codes, scales = group
+        query_codes, query_scale = quantize_int8(query_vec)
+        sims = (codes @ query_codes.astype(np.int32)) * scales * query_scale
+        best = int(np.argmax(sims))
+        if sims[best] >= self.threshold:
+            with self._lock:
+                return self._fresh(keys[best], fkey), query_vec
+        return None, query_vec
+
+    def put(self, question: str, filters, answer: str, query_vec: np.ndarray = None):
+        key = self._hash(question)
+        fkey = filters_key(filters)
+        if query_vec is None:
+            query_vec = self.embed(question)
+        codes, scale = quantize_int8(query_vec)
+        created = time.time()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO qa_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, self.catalog_key, fkey, codes.tobytes(), scale, answer, created)
+                )
+                self._conn.commit()
+            except sqlite3.DatabaseError:
+                pass  # Persisting is best-effort; the entry is still kept in memory
+            self._add(key, fkey, codes, scale, answer, created)
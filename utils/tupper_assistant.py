@@ -7,12 +7,23 @@ sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
 
 from langchain.vectorstores import Chroma
 from langchain.embeddings import HuggingFaceEmbeddings
+import langchain_core
 from langchain_core.documents import Document
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import BaseOutputParser
+from langchain_core.exceptions import OutputParserException
 from langchain.chains.combine_documents import create_stuff_documents_chain
-from utils.openai_router_wrapper import ChatOpenRouter
+from utils.openai_router_wrapper import get_chat, get_config
+from utils.qa_cache import QACache
 import os
+import re
+import orjson
+import asyncio
+import hashlib
+import pickle
+import numpy as np
+import pandas as pd
+import streamlit as st
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -52,18 +63,132 @@ except:
     )
 
 
+# -----------------------------------------------------------------------------
+# DOCUMENT CACHE (DISK + PROCESS-WIDE)
+# -----------------------------------------------------------------------------
+
+"""
+The broad "plato" query below returns the whole catalog, which only changes when the
+vectorstore is rebuilt. Running it on every cold start means one embedding forward pass
+plus a full Chroma scan, so the result is pickled to `.cache/` keyed by the Chroma sqlite
+file (header bytes + mtime) and the langchain_core version. On top of that,
+`st.cache_resource` lets all Streamlit sessions in the same process share a single
+in-memory copy.
+"""
+cache_dir = base_dir.parent / ".cache"
+
+
+def _chroma_cache_key():
+    """
+    Returns a hash identifying the current state of the persisted Chroma DB,
+    or None if there is no sqlite file on disk (in-memory fallback).
+    """
+    sqlite_file = chroma_path / "chroma.sqlite3"
+    if not sqlite_file.exists():
+        return None
+    with open(sqlite_file, "rb") as f:
+        header = f.read(8192)
+    mtime = str(os.path.getmtime(sqlite_file)).encode()
+    # Pickled Documents are only guaranteed to load with the same langchain_core version
+    version = langchain_core.__version__.encode()
+    return hashlib.sha256(header + mtime + version).hexdigest()
+
+
+@st.cache_resource(show_spinner=False)
+def load_all_docs() -> list:
+    """
+    Loads every dish document, reusing the on-disk pickle when the vectorstore is unchanged.
+    Stale cache files from previous vectorstore builds are removed when a new one is written.
+    """
+    key = _chroma_cache_key()
+    cache_file = cache_dir / f"all_docs_{key}.pkl" if key else None
+
+    if cache_file and cache_file.exists():
+        try:
+            with open(cache_file, "rb") as f:
+                return pickle.load(f)
+        except Exception:
+            pass  # Corrupted, unreadable or incompatible cache: rebuild it below
+
+    docs = vectordb.similarity_search("plato", k=300)
+
+    if cache_file:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        for stale in cache_dir.glob("all_docs_*.pkl"):
+            stale.unlink(missing_ok=True)
+        with open(cache_file, "wb") as f:
+            pickle.dump(docs, f)
+    return docs
+
+
 # Retrieve and cache documents for future operations (broad query for dish-related docs)
-all_docs = vectordb.similarity_search("plato", k=300)
+all_docs = load_all_docs()
+
+"""
+Metadata is also kept column-wise in a DataFrame (one column per metadata field, one row
+per document). Filtering and fallback scoring then become boolean-mask / array operations
+instead of walking every Document's metadata dict on each query. Row `i` of the DataFrame
+corresponds to `all_docs[i]`, so only the surviving rows are mapped back to Documents.
+"""
+all_docs_df = pd.DataFrame([d.metadata for d in all_docs])
+
+
+def rows_to_docs(df: pd.DataFrame) -> list:
+    """
+    Maps the rows of (a subset of) `all_docs_df` back to their formatted Documents
+    (see `formatted_all_docs` below).
+    """
+    return [formatted_all_docs[i] for i in df.index]
 
 # -----------------------------------------------------------------------------
 # FILTERING SETUP USING LLM
 # -----------------------------------------------------------------------------
 
+"""
+The filter JSON sits on the critical path between the two LLM calls, so it is parsed with
+orjson (C) instead of the generic JSON parser, and without schema validation: downstream
+code only reads the keys it knows about. Markdown code fences around the JSON are tolerated.
+"""
+_JSON_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.DOTALL)
+
+
+class OrjsonOutputParser(BaseOutputParser[dict]):
+    """
+    Parses the LLM output as a JSON object using orjson.
+    """
+    def parse(self, text: str) -> dict:
+        fenced = _JSON_FENCE_RE.search(text)
+        if fenced:
+            text = fenced.group(1)
+        try:
+            parsed = orjson.loads(text.strip())
+        except orjson.JSONDecodeError as e:
+            raise OutputParserException(f"Invalid JSON output: {text}") from e
+        if not isinstance(parsed, dict):
+            raise OutputParserException(f"Expected a JSON object, got: {text}")
+        return parsed
+
+    def get_format_instructions(self) -> str:
+        # Same instructions as LangChain's JsonOutputParser without a schema
+        return "Return a JSON object."
+
+    @property
+    def _type(self) -> str:
+        return "orjson_output_parser"
+
+
 # JSON parser to extract structured filter info
-parser = JsonOutputParser()
+parser = OrjsonOutputParser()
+
+"""
+Prompts are split into a static system message (instructions, allowed keys, format
+instructions) followed by a user message holding only the per-query values, so every
+request starts with an identical prefix. Provider-side prompt caching keys on that prefix,
+but only from ~1024 tokens on; these instructions are shorter, so they are not cached.
+"""
 
 # Prompt to ask the LLM to extract filters in JSON format (used for narrowing down dishes)
-filter_prompt = PromptTemplate.from_template("""
+FILTER_SYSTEM = f"""
 Eres un asistente que extrae filtros estructurados de preguntas sobre comida. La respuesta debe ser un JSON válido y NADA MÁS. No expliques nada.
 
 Devuelve solo las claves relevantes entre:
@@ -81,35 +206,116 @@ Devuelve solo las claves relevantes entre:
 - congelar: booleano
 - kcal: cadena de comparación como "<400" o ">500"
 
-Pregunta: {question}
+{parser.get_format_instructions()}
+"""
 
-{format_instructions}
-""").partial(format_instructions=parser.get_format_instructions())
+filter_prompt = ChatPromptTemplate.from_messages([
+    ("system", FILTER_SYSTEM),
+    ("user", "Pregunta: {question}")
+])
 
 # Chain to extract filters via LLM
-filter_chain = filter_prompt | ChatOpenRouter(temperature=0.1) | parser
+filter_chain = filter_prompt | get_chat(0.1) | parser
 
 # -----------------------------------------------------------------------------
 # APPLY STRUCTURED FILTERS TO METADATA
 # -----------------------------------------------------------------------------
 
-def apply_filters(docs, filters):
+def parse_kcal_filter(val):
+    """
+    Parses a kcal comparison string such as "<400" or "> 500" into (operator, threshold).
+    Returns None if the value is not a valid comparison.
+    """
+    if not isinstance(val, str):
+        return None
+    val = val.replace(" ", "")
+    if len(val) < 2 or val[0] not in "<>":
+        return None
+    try:
+        return val[0], float(val[1:])
+    except ValueError:
+        return None
+
+
+def kcal_mask(df: pd.DataFrame, op: str, thr: float) -> np.ndarray:
     """
-    Applies the parsed filters to the list of documents.
-    Each filter checks a metadata field and filters out documents that don't match.
-    Special handling is applied for kcal ranges (e.g., <400, >500).
+    Boolean mask of the rows whose kcal satisfies the comparison (missing kcal never matches).
     """
-    result = docs
+    if "kcal" not in df:
+        return np.zeros(len(df), dtype=bool)
+    kcal = pd.to_numeric(df["kcal"], errors="coerce").to_numpy(dtype=float)
+    return kcal < thr if op == "<" else kcal > thr
+
+
+def build_filter_index(df: pd.DataFrame) -> dict:
+    """
+    Precomputes the structures used by `apply_filters`:
+    - "bitmaps": for every boolean metadata column, a packed bitmap (one bit per row) of the
+      rows equal to True and of the rows equal to False, keyed by (column, value).
+    - "kcal_order" / "kcal_sorted": row positions sorted by kcal and the sorted values, so a
+      kcal threshold maps to a contiguous slice found by binary search.
+
+    Filtering then ANDs a handful of small uint8 arrays instead of comparing every row.
+    """
+    bitmaps = {}
+    for key in df.columns:
+        values = df[key].dropna()
+        if len(values) and values.map(lambda v: isinstance(v, (bool, np.bool_))).all():
+            for flag in (True, False):
+                bitmaps[(key, flag)] = np.packbits((df[key] == flag).to_numpy(dtype=bool))
+
+    kcal = (pd.to_numeric(df["kcal"], errors="coerce").to_numpy(dtype=float)
+            if "kcal" in df else np.full(len(df), np.nan))
+    kcal_order = np.argsort(kcal, kind="stable")  # NaN (missing kcal) sorts last
+    return {
+        "n_rows": len(df),
+        "bitmaps": bitmaps,
+        "kcal_order": kcal_order,
+        "kcal_sorted": kcal[kcal_order],
+        "kcal_known": int(np.count_nonzero(~np.isnan(kcal)))
+    }
+
+
+def kcal_bitmap(index: dict, op: str, thr: float) -> np.ndarray:
+    """
+    Packed bitmap of the rows whose kcal satisfies the comparison (missing kcal never matches).
+    """
+    if op == "<":
+        start, end = 0, np.searchsorted(index["kcal_sorted"], thr, side="left")
+    else:
+        start, end = np.searchsorted(index["kcal_sorted"], thr, side="right"), index["kcal_known"]
+    selected = np.zeros(index["n_rows"], dtype=bool)
+    selected[index["kcal_order"][start:end]] = True
+    return np.packbits(selected)
+
+
+def apply_filters(df: pd.DataFrame, filters: dict, index: dict) -> pd.DataFrame:
+    """
+    Applies the parsed filters to the metadata DataFrame, using its precomputed `index`
+    (see `build_filter_index`). Every filter becomes a packed bitmap; all bitmaps are AND-ed
+    and the surviving rows are returned.
+    Special handling is applied for kcal ranges (e.g., <400, >500); non-boolean values on
+    other fields fall back to a direct column comparison.
+    """
+    bits = np.packbits(np.ones(len(df), dtype=bool))
     for key, val in filters.items():
         if key == "kcal":
-            val = val.replace(" ", "")
-            if val.startswith("<"):
-                result = [d for d in result if d.metadata.get("kcal", 9999) < float(val[1:])]
-            elif val.startswith(">"):
-                result = [d for d in result if d.metadata.get("kcal", 0) > float(val[1:])]
+            parsed = parse_kcal_filter(val)
+            if parsed:
+                bits &= kcal_bitmap(index, *parsed)
+        elif isinstance(val, bool) and (key, val) in index["bitmaps"]:
+            bits &= index["bitmaps"][(key, val)]
+        elif key in df and not isinstance(val, (list, tuple, set, dict)):
+            bits &= np.packbits((df[key] == val).to_numpy(dtype=bool))
         else:
-            result = [d for d in result if d.metadata.get(key) == val]
-    return result
+            # Unknown metadata field or non-scalar value (e.g. a list of allergens):
+            # no document can match it
+            bits[:] = 0
+    rows = np.flatnonzero(np.unpackbits(bits, count=len(df)))
+    return df.iloc[rows]
+
+
+filter_index = build_filter_index(all_docs_df)
 
 # -----------------------------------------------------------------------------
 # DOCUMENT FORMATTER FOR FINAL QA CONTEXT
@@ -144,13 +350,22 @@ def format_doc(doc: Document) -> Document:
     ])
     return Document(page_content=f"{doc.page_content}\n\n{extras}", metadata=meta)
 
+
+"""
+The formatted context of a dish does not depend on the question, so every document is
+formatted once at load time. Queries then just pick the pre-built Documents of the
+surviving rows, with no per-query string building or Document allocation.
+"""
+formatted_all_docs = [format_doc(doc) for doc in all_docs]
+
 # -----------------------------------------------------------------------------
 # FALLBACK SCORING WHEN STRICT FILTERS FAIL
 # -----------------------------------------------------------------------------
 
-def score_approx_match(doc: Document, filters: dict) -> float:
+def score_approx_match(df: pd.DataFrame, filters: dict) -> np.ndarray:
     """
-    Computes a fallback score for a document when strict filters return too few results.
+    Computes fallback scores for every row of the metadata DataFrame
+    when strict filters return too few results.
 
     - For boolean fields: +1 if the field matches.
     - For "kcal": +1 if it meets the threshold.
@@ -159,32 +374,55 @@ def score_approx_match(doc: Document, filters: dict) -> float:
 
     This allows approximate prioritization of documents that "almost" match.
     """
-    meta = doc.metadata
-    score = 0.0
+    score = np.zeros(len(df), dtype=float)
+    penalized = np.zeros(len(df), dtype=bool)
     for key, val in filters.items():
         if key == "kcal":
-            kcal = meta.get("kcal")
-            if isinstance(kcal, (int, float)) and isinstance(val, str):
-                val = val.replace(" ", "")
-                if val.startswith("<") and kcal < float(val[1:]):
-                    score += 1.0
-                elif val.startswith(">") and kcal > float(val[1:]):
-                    score += 1.0
+            parsed = parse_kcal_filter(val)
+            if parsed:
+                score += kcal_mask(df, *parsed)
         elif key == "alto_proteina" and val is True:
-            proteinas = meta.get("proteinas")
-            if isinstance(proteinas, (int, float)):
-                score += min(proteinas / 5, 2.5)  # Up to 2.5 points based on protein
-        elif isinstance(val, bool):
-            if meta.get(key) == val:
-                score += 1.0
-            elif key in ["is_vegetariano", "is_vegano"] and meta.get(key) is False:
-                return -1.0  # Penalize strongly if explicitly requested and not matching
-    return score
+            if "proteinas" in df:
+                proteinas = pd.to_numeric(df["proteinas"], errors="coerce").to_numpy(dtype=float)
+                # Up to 2.5 points based on protein (missing values add nothing)
+                score += np.nan_to_num(np.minimum(proteinas / 5, 2.5))
+        elif isinstance(val, bool) and key in df:
+            col = df[key]
+            score += (col == val).to_numpy(dtype=bool)
+            if key in ["is_vegetariano", "is_vegano"] and val is True:
+                # Penalize strongly if explicitly requested and not matching
+                penalized |= (col == False).to_numpy(dtype=bool)
+    return np.where(penalized, -1.0, score)
+
+def top_k_positive(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Returns the positions of the `k` highest positive scores, best first.
+
+    Selection uses a partition (O(N)) instead of sorting every candidate; only the selected
+    positions are sorted. Ties keep their original order, so the result is the same as a
+    stable descending sort truncated to `k`.
+    """
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > k:
+        candidate_scores = scores[candidates]
+        kth = np.partition(candidate_scores, -k)[-k]  # k-th largest score
+        above = candidates[candidate_scores > kth]
+        ties = candidates[candidate_scores == kth][:k - len(above)]
+        candidates = np.sort(np.concatenate([above, ties]))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
 
 # -----------------------------------------------------------------------------
 # RULE TO DECIDE WHETHER TO FALLBACK
 # -----------------------------------------------------------------------------
 
+# Keywords signalling that the user wants variety, matched anywhere in the question
+# (case-insensitive, accents optional in "días" / "menú") with a single precompiled scan
+_VARIETY_RE = re.compile(
+    r"semana|plan|almuerzos|platos|comidas|d[ií]as|repetir|men[uú]|distintos|opciones|tuppers",
+    re.IGNORECASE
+)
+
+
 def should_use_fallback(question: str, formatted_docs: list) -> bool:
     """
     Decides if fallback is necessary:
@@ -194,11 +432,7 @@ def should_use_fallback(question: str, formatted_docs: list) -> bool:
     """
     base_threshold = 3
     extended_threshold = 5
-    keywords = [
-        "semana", "semanas", "plan", "planificar", "almuerzos", "platos",
-        "comidas", "días", "repetir", "menú", "distintos", "opciones", "tuppers"
-    ]
-    needs_variety = any(word in question.lower() for word in keywords)
+    needs_variety = _VARIETY_RE.search(question) is not None
     min_required = extended_threshold if needs_variety else base_threshold
     return len(formatted_docs) < min_required
 
@@ -206,7 +440,7 @@ def should_use_fallback(question: str, formatted_docs: list) -> bool:
 # FINAL QA PROMPT TO GENERATE RECOMMENDATIONS
 # -----------------------------------------------------------------------------
 
-qa_prompt = PromptTemplate.from_template("""
+QA_SYSTEM = """
 Eres un asistente de Nococinomas, una tienda online de tuppers saludables y variados.
 
 Tu función es:
@@ -216,25 +450,78 @@ Tu función es:
 - Si el usuario menciona días o semanas, puedes sugerir repeticiones razonables, pero siempre a partir de los platos reales del contexto.
 - Limita la lista a los 3–5 platos más relevantes, con sus detalles (proteínas, precio, etc.).
 - No expliques el funcionamiento del sistema ni menciones que estás usando un modelo.
+"""
 
-Platos disponibles:
-{context}
-
-Solicitud del usuario:
-{question}
-
-Tu respuesta (concreta, clara, basada solo en los platos reales):
-""")
+qa_prompt = ChatPromptTemplate.from_messages([
+    ("system", QA_SYSTEM),
+    ("user",
+     "Platos disponibles:\n{context}\n\n"
+     "Solicitud del usuario:\n{question}\n\n"
+     "Tu respuesta (concreta, clara, basada solo en los platos reales):")
+])
 
 qa_chain = create_stuff_documents_chain(
-    llm=ChatOpenRouter(temperature=0),
+    llm=get_chat(0),
     prompt=qa_prompt
 )
 
+# -----------------------------------------------------------------------------
+# RESPONSE CACHE (EXACT + SEMANTIC)
+# -----------------------------------------------------------------------------
+
+"""
+Answers are cached in two tiers (exact question, then semantically similar question with
+identical filters); see `utils/qa_cache.py`. Entries are persisted to
+`.cache/qa_cache.sqlite` and tied to the current vectorstore build, LLM model and prompts.
+"""
+qa_cache_path = cache_dir / "qa_cache.sqlite"
+QA_CACHE_TTL = 7 * 24 * 3600
+SEMANTIC_THRESHOLD = 0.97
+
+
+@st.cache_resource(show_spinner=False)
+def load_qa_cache() -> QACache:
+    # Answers depend on the catalog, the model and the prompts
+    prompts_hash = hashlib.sha256((FILTER_SYSTEM + QA_SYSTEM).encode()).hexdigest()
+    catalog_key = ":".join([
+        str(_chroma_cache_key()),
+        get_config()["LLM_MODEL"],
+        prompts_hash
+    ])
+    return QACache(
+        qa_cache_path, catalog_key, QA_CACHE_TTL, SEMANTIC_THRESHOLD, embedding.embed_query
+    )
+
+
+qa_cache = load_qa_cache()
+
 # -----------------------------------------------------------------------------
 # MAIN ENTRY POINT: FULL PIPELINE TO GET RECOMMENDATION
 # -----------------------------------------------------------------------------
 
+def build_context(question: str, filters: dict) -> list:
+    """
+    Selects the formatted dish documents used as context for the final answer:
+    strict filter matches first, topped up with the best approximate matches when
+    there are too few of them.
+    """
+    filtered_df = apply_filters(all_docs_df, filters, filter_index)
+    formatted_docs = rows_to_docs(filtered_df)
+
+    # If too few matches, fallback with approximate scoring
+    if should_use_fallback(question, formatted_docs):
+        # Row labels are positions in all_docs, so exclusion is a positional mask
+        # (no per-document equality checks against the filtered set)
+        not_filtered = np.ones(len(all_docs_df), dtype=bool)
+        not_filtered[filtered_df.index.to_numpy()] = False
+        fallback_df = all_docs_df[not_filtered]
+        scores = score_approx_match(fallback_df, filters)
+        # Best 10 documents with positive score
+        formatted_docs += rows_to_docs(fallback_df.iloc[top_k_positive(scores, 10)])
+
+    return formatted_docs
+
+
 def get_answer_to_question(question: str) -> str:
     """
     Main callable pipeline:
@@ -243,31 +530,75 @@ def get_answer_to_question(question: str) -> str:
     3. If too few matches, uses fallback scoring to add approximate matches.
     4. Formats the final context.
     5. Generates a natural language answer with recommendations.
+
+    Answers are served from `qa_cache` when the same question was already answered, or
+    a near-identical one with the same extracted filters, and stored there after a
+    successful generation.
     """
+    cached = qa_cache.get_exact(question)
+    if cached is not None:
+        return cached
+
     try:
         filters = filter_chain.invoke({"question": question})
     except Exception:
         return "❌ No se pudieron interpretar los filtros de la pregunta."
 
-    filtered_docs = apply_filters(all_docs, filters)
-    formatted_docs = [format_doc(doc) for doc in filtered_docs]
-
-    # If too few matches, fallback with approximate scoring
-    if should_use_fallback(question, formatted_docs):
-        fallback_candidates = [doc for doc in all_docs if doc not in filtered_docs]
-        scored_fallbacks = sorted(
-            fallback_candidates,
-            key=lambda d: score_approx_match(d, filters),
-            reverse=True
-        )
-        # Only add documents with positive score
-        scored_fallbacks = [d for d in scored_fallbacks if score_approx_match(d, filters) > 0]
-        formatted_docs += [format_doc(doc) for doc in scored_fallbacks[:10]]
+    cached, query_vec = qa_cache.get_similar(question, filters)
+    if cached is not None:
+        return cached
 
     # Final LLM generation based on filtered + fallback-enriched documents
     response = qa_chain.invoke({
-        "context": formatted_docs,
+        "context": build_context(question, filters),
         "question": question
     })
 
+    qa_cache.put(question, filters, response, query_vec)
     return response
+
+
+async def astream_answer_to_question(question: str):
+    """
+    Async streaming version of `get_answer_to_question`.
+
+    Yields the answer in chunks as the QA model generates them, so the UI can show text
+    as soon as the first tokens arrive instead of waiting for the full completion.
+    Both LLM calls are awaited instead of blocking, so a single event loop can serve
+    several users while their requests wait on OpenRouter. The semantic cache lookup
+    (which computes an embedding) runs in a worker thread; a cached answer is yielded
+    as a single chunk, and a fully streamed answer is stored once complete.
+    """
+    cached = qa_cache.get_exact(question)
+    if cached is not None:
+        yield cached
+        return
+
+    try:
+        filters = await filter_chain.ainvoke({"question": question})
+    except Exception:
+        yield "❌ No se pudieron interpretar los filtros de la pregunta."
+        return
+
+    cached, query_vec = await asyncio.to_thread(qa_cache.get_similar, question, filters)
+    if cached is not None:
+        yield cached
+        return
+
+    chunks = []
+    async for chunk in qa_chain.astream({
+        "context": build_context(question, filters),
+        "question": question
+    }):
+        chunks.append(chunk)
+        yield chunk
+
+    await asyncio.to_thread(qa_cache.put, question, filters, "".join(chunks), query_vec)
+
+
+async def aget_answer_to_question(question: str) -> str:
+    """
+    Async, non-streaming version of `get_answer_to_question`: collects the full answer
+    from `astream_answer_to_question`.
+    """
+    return "".join([chunk async for chunk in astream_answer_to_question(question)])